@@ -1,11 +1,21 @@
 import requests
-import json
 import os
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+import json_utils
 
 # Load environment variables
 load_dotenv()
 
+# Shared session so OpenAI and mothership calls reuse keep-alive connections
+# instead of doing a new TCP + TLS handshake on every request
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+# Seconds to wait on the mothership positions endpoint, so a stuck fetch
+# can't hang the dashboard request indefinitely
+MOTHERSHIP_TIMEOUT = 10
+
 # Define the trading tool for ChatGPT
 TRADING_TOOLS = [
     {
@@ -62,13 +72,14 @@ def get_chatgpt_recommendation(tick_data):
     if not api_key:
         raise ValueError("OPENAI_API_KEY not found in .env file")
     
-    # Create the prompt for ChatGPT
+    # Create the prompt for ChatGPT. Data is embedded as compact JSON: the model
+    # reads it just as well, and indentation roughly doubles the prompt tokens.
     prompt = f"""
     Analyze the following stock positions and market data, then provide trading recommendations.
     
-    Current Positions: {json.dumps(tick_data.get('POSITIONS', []), indent=2)}
-    Market Summary: {json.dumps(tick_data.get('Market_Summary', []), indent=2)}
-    Market History: {json.dumps(tick_data.get('market_history', []), indent=2)}
+    Current Positions: {json_utils.dumps(tick_data.get('POSITIONS', [])).decode()}
+    Market Summary: {json_utils.dumps(tick_data.get('Market_Summary', [])).decode()}
+    Market History: {json_utils.dumps(tick_data.get('market_history', [])).decode()}
     Date: {tick_data.get('DAY', 'Unknown')}
     
     For each position, decide whether to:
@@ -103,16 +114,20 @@ def get_chatgpt_recommendation(tick_data):
     }
     
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        # Encode the request body with orjson rather than letting requests
+        # re-serialize the whole prompt with the stdlib encoder
+        response = _session.post(url, headers=headers, data=json_utils.dumps(payload))
         response.raise_for_status()
         
-        result = response.json()
+        # Parse the raw body with orjson; response.json() goes through the
+        # stdlib decoder and charset detection on every call
+        result = json_utils.loads(response.content)
         message = result['choices'][0]['message']
         
         # Check if ChatGPT used the tool
         if message.get('tool_calls'):
             tool_call = message['tool_calls'][0]
-            function_args = json.loads(tool_call['function']['arguments'])
+            function_args = json_utils.loads(tool_call['function']['arguments'])
             return function_args.get('trades', [])
         else:
             # If no tool call, return empty recommendations
@@ -153,7 +168,7 @@ def post_trade_to_mothership(trade_id, trades):
     }
     
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        response = _session.post(url, headers=headers, json=payload)
         response.raise_for_status()
         
         return response.json()
@@ -180,7 +195,7 @@ def get_mothership_positions():
     }
     
     try:
-        response = requests.get(positions_url, headers=headers)
+        response = _session.get(positions_url, headers=headers, timeout=MOTHERSHIP_TIMEOUT)
         response.raise_for_status()
         return response.json()
     
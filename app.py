@@ -1,22 +1,42 @@
-from flask import Flask, request, jsonify, render_template_string
-import json
+from flask import Flask, request, render_template
+import atexit
+import hmac
+import logging
 import os
+import threading
+import time
+from collections import deque
 from datetime import datetime
 from functools import wraps
+from itertools import islice
 from dotenv import load_dotenv
+import json_utils
+from validators import validate_tick_payload, coerce_numbers
 from ai_module import process_tick_with_ai, get_mothership_positions  # Import your AI module
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
+logger = logging.getLogger(__name__)
 
 # File paths
 POSITIONS_FILE = "positions.json"
-TRADING_LOG_FILE = "trading_log.json"
+TRADING_LOG_FILE = "trading_log.jsonl"
+
+# Number of trading log entries kept in memory for the dashboard
+TRADING_LOG_MAXLEN = 10_000
+# Seconds between background writes of new trading log entries
+TRADING_LOG_FLUSH_INTERVAL = 5
 
 # API Key from environment
 API_KEY = os.getenv("API_KEY")
+# Encoded once so each request only has to encode the key it provides
+_API_KEY_BYTES = API_KEY.encode() if API_KEY else b""
+
+def _json(payload, status=200):
+    """Build a JSON response with orjson instead of Flask's stdlib-based jsonify"""
+    return app.response_class(json_utils.dumps(payload), status=status, mimetype='application/json')
 
 # Authentication decorator
 def require_api_key(f):
@@ -24,15 +44,15 @@ def require_api_key(f):
     def decorated_function(*args, **kwargs):
         provided_key = request.headers.get('apikey')
         
-        # Debug print
-        print(f"Expected API_KEY: {API_KEY}")
-        print(f"Provided API Key: {provided_key}")
+        # Formatting is skipped unless debug logging is enabled
+        logger.debug("Expected API_KEY: %s, provided API key: %s", API_KEY, provided_key)
         
         if not API_KEY:
-            return jsonify({"result": "failure", "error": "Server API key not configured"}), 500
+            return _json({"result": "failure", "error": "Server API key not configured"}, 500)
         
-        if provided_key != API_KEY:
-            return jsonify({"result": "failure", "error": "Invalid API key"}), 401
+        # Constant-time comparison so response timing doesn't leak the key
+        if not provided_key or not hmac.compare_digest(provided_key.encode(), _API_KEY_BYTES):
+            return _json({"result": "failure", "error": "Invalid API key"}, 401)
         return f(*args, **kwargs)
     return decorated_function
 
@@ -40,43 +60,82 @@ def require_api_key(f):
 def load_positions():
     """Load current positions from file"""
     if os.path.exists(POSITIONS_FILE):
-        with open(POSITIONS_FILE, 'r') as f:
-            return json.load(f)
+        return json_utils.load_file(POSITIONS_FILE)
     return []
 
+# Ticks save positions up to twice each; coalesce those into one write per second
+_positions_writer = json_utils.WriteCoalescer(POSITIONS_FILE)
+
 def save_positions(positions):
     """Save positions to file"""
-    with open(POSITIONS_FILE, 'w') as f:
-        json.dump(positions, f, indent=2)
+    _positions_writer.submit(positions)
+
+# The trading log file is append-only: one JSON line per tick, written
+# through a handle kept open for the life of the process. Opening it repairs
+# a line torn by a crash, so new entries don't get appended onto it.
+_trading_log_file = json_utils.open_append(TRADING_LOG_FILE)
 
 def load_trading_log():
     """Load trading log from file"""
     if os.path.exists(TRADING_LOG_FILE):
-        with open(TRADING_LOG_FILE, 'r') as f:
-            return json.load(f)
+        return json_utils.load_lines(TRADING_LOG_FILE)
     return []
 
-def save_trading_log(log):
-    """Save trading log to file"""
-    with open(TRADING_LOG_FILE, 'w') as f:
-        json.dump(log, f, indent=2)
+# Recent trading log entries are kept in memory so ticks and the dashboard
+# never read the log file; new entries are written out by a background thread
+trading_log = deque(load_trading_log(), maxlen=TRADING_LOG_MAXLEN)
+_unsaved_log_lines = []
+_trading_log_lock = threading.Lock()
+
+def append_trading_log(log_entry):
+    """Record a trading log entry; it is written to file in the background"""
+    # Serialize here so an entry that can't be encoded fails in the request
+    # that produced it, rather than in the background writer
+    line = json_utils.dumps(log_entry) + b'\n'
+    with _trading_log_lock:
+        trading_log.append(log_entry)
+        _unsaved_log_lines.append(line)
+
+def flush_trading_log():
+    """Append any unsaved trading log entries to the log file"""
+    with _trading_log_lock:
+        if not _unsaved_log_lines:
+            return
+        _trading_log_file.write(b''.join(_unsaved_log_lines))
+        _trading_log_file.flush()
+        _unsaved_log_lines.clear()
+
+def _flush_trading_log_periodically():
+    while True:
+        time.sleep(TRADING_LOG_FLUSH_INTERVAL)
+        try:
+            flush_trading_log()
+        except Exception:
+            # Keep the writer alive; unsaved lines are retried on the next pass
+            logger.exception("Failed to write the trading log")
+
+threading.Thread(target=_flush_trading_log_periodically, daemon=True).start()
+atexit.register(flush_trading_log)
+
+def recent_trading_log(count):
+    """Return the last `count` trading log entries, oldest first"""
+    with _trading_log_lock:
+        recent = list(islice(reversed(trading_log), count))
+    recent.reverse()
+    return recent
 
 def calculate_unrealized_pnl(positions, market_summary):
     """Calculate unrealized P&L based on current market prices"""
-    # Create a mapping of ticker to current price
-    current_prices = {item['ticker']: float(item['current_price']) 
+    # Create a mapping of ticker to current price. Prices and quantities are
+    # used as-is: /tick has already validated them and converted numeric strings.
+    current_prices = {item['ticker']: item['current_price'] 
                      for item in market_summary}
     
     total_pnl = 0.0
     for position in positions:
-        ticker = position['ticker']
-        quantity = float(position['quantity'])
-        purchase_price = float(position['purchase_price'])
-        
-        if ticker in current_prices:
-            current_price = current_prices[ticker]
-            pnl = (current_price - purchase_price) * quantity
-            total_pnl += pnl
+        current_price = current_prices.get(position['ticker'])
+        if current_price is not None:
+            total_pnl += (current_price - position['purchase_price']) * position['quantity']
     
     return total_pnl
 
@@ -92,7 +151,7 @@ def home():
 @require_api_key
 def healthcheck():
     """Health check endpoint"""
-    return jsonify({"result": "success"}), 200
+    return _json({"result": "success"}, 200)
 
 
 @app.route('/tick/<trade_id>', methods=['POST'])
@@ -105,15 +164,16 @@ def tick(trade_id):
         trade_id (str): Unique identifier for this trade (path parameter)
     """
     try:
-        # Get the tick data from request
-        tick_data = request.get_json(force=True)
+        # Parse the raw body with orjson instead of Flask's stdlib-based get_json
+        raw_body = request.get_data()
+        tick_data = json_utils.loads(raw_body)
         
         if not tick_data:
-            return jsonify({"result": "failure", "error": "No data provided"}), 400
+            return _json({"result": "failure", "error": "No data provided"}, 400)
         
     except Exception as e:
         # Handle non-JSON data
-        return jsonify({"result": "failure", "error": "Invalid JSON data"}), 400
+        return _json({"result": "failure", "error": "Invalid JSON data"}, 400)
     
     try:
         # Extract fields from tick data
@@ -123,21 +183,25 @@ def tick(trade_id):
         
         # Validate required fields - all three are required
         if not positions:
-            return jsonify({"result": "failure", "error": "Missing Positions field"}), 400
+            return _json({"result": "failure", "error": "Missing Positions field"}, 400)
         
         if not market_summary:
-            return jsonify({"result": "failure", "error": "Missing Market_Summary field"}), 400
+            return _json({"result": "failure", "error": "Missing Market_Summary field"}, 400)
         
         if not market_history:
-            return jsonify({"result": "failure", "error": "Missing market_history field"}), 400
+            return _json({"result": "failure", "error": "Missing market_history field"}, 400)
         
-        # Extract the most recent date from market_history
-        day = None
-        if market_history and len(market_history) > 0:
-            # Get the most recent date
-            day = market_history[-1].get('day', datetime.now().strftime('%Y-%m-%d'))
-        else:
-            day = datetime.now().strftime('%Y-%m-%d')
+        # Reject malformed rows up front rather than failing partway through the
+        # tick, then turn any numeric strings into numbers before anything
+        # (the AI call, the mothership post, P&L) uses them
+        is_valid, error = validate_tick_payload(tick_data, raw_body)
+        if not is_valid:
+            return _json({"result": "failure", "error": error}, 400)
+        coerce_numbers(tick_data)
+        
+        # The most recent date; market_history is non-empty and every row has
+        # a validated day
+        day = market_history[-1]['day']
         
         # Update local positions from tick data
         save_positions(positions)
@@ -170,7 +234,6 @@ def tick(trade_id):
         unrealized_pnl = calculate_unrealized_pnl(positions, market_summary)
         
         # Log the trade
-        trading_log = load_trading_log()
         log_entry = {
             "trade_id": trade_id,
             "timestamp": datetime.now().isoformat(),
@@ -181,11 +244,10 @@ def tick(trade_id):
             "unrealized_pnl": unrealized_pnl,
             "mothership_response": mothership_response
         }
-        trading_log.append(log_entry)
-        save_trading_log(trading_log)
+        append_trading_log(log_entry)
         
         # Return response in expected format
-        return jsonify({
+        return _json({
             "result": "success",
             "summary": {
                 "unrealized_pnl": unrealized_pnl,
@@ -193,11 +255,118 @@ def tick(trade_id):
                 "day": day
             },
             "decisions": recommendations
-        }), 200
+        }, 200)
     
     except Exception as e:
         print(f"Error in /tick: {e}")
-        return jsonify({"result": "failure", "error": str(e)}), 500
+        return _json({"result": "failure", "error": str(e)}, 500)
+
+
+# Simple HTML dashboard, compiled once at startup instead of on every request
+DASHBOARD_HTML = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Trading Dashboard</title>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 20px; background-color: #f5f5f5; }
+        h1 { color: #333; }
+        h2 { color: #555; margin-top: 30px; }
+        table { border-collapse: collapse; width: 100%; margin-top: 20px; background-color: white; }
+        th, td { border: 1px solid #ddd; padding: 12px; text-align: left; }
+        th { background-color: #4CAF50; color: white; }
+        tr:nth-child(even) { background-color: #f9f9f9; }
+        .section { margin-top: 30px; background-color: white; padding: 20px; border-radius: 5px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }
+        .info { background-color: #e3f2fd; padding: 10px; border-radius: 5px; margin-bottom: 20px; }
+        .mothership-link { color: #1976d2; text-decoration: none; }
+        .mothership-link:hover { text-decoration: underline; }
+    </style>
+</head>
+<body>
+    <h1>🤖 Trading Dashboard</h1>
+
+    <div class="info">
+        <strong>Mothership Positions:</strong> 
+        <a href="{{ mothership_url }}" target="_blank" class="mothership-link">
+            View Live Positions on Mothership →
+        </a>
+    </div>
+
+    <div class="section">
+        <h2>📊 Mothership Current Positions</h2>
+        {% if mothership_positions.error %}
+            <p style="color: red;">Error fetching mothership positions: {{ mothership_positions.error }}</p>
+        {% elif mothership_positions %}
+            <table>
+                <tr>
+                    <th>Ticker</th>
+                    <th>Quantity</th>
+                    <th>Purchase Price</th>
+                </tr>
+                {% for pos in mothership_positions %}
+                <tr>
+                    <td><strong>{{ pos.ticker }}</strong></td>
+                    <td>{{ pos.quantity }}</td>
+                    <td>${{ "%.2f"|format(pos.purchase_price) }}</td>
+                </tr>
+                {% endfor %}
+            </table>
+        {% else %}
+            <p>No positions found on mothership.</p>
+        {% endif %}
+    </div>
+
+    <div class="section">
+        <h2>💼 Local Positions</h2>
+        {% if positions %}
+        <table>
+            <tr>
+                <th>Ticker</th>
+                <th>Quantity</th>
+                <th>Purchase Price</th>
+            </tr>
+            {% for pos in positions %}
+            <tr>
+                <td><strong>{{ pos.ticker }}</strong></td>
+                <td>{{ pos.quantity }}</td>
+                <td>${{ "%.2f"|format(pos.purchase_price) }}</td>
+            </tr>
+            {% endfor %}
+        </table>
+        {% else %}
+            <p>No local positions recorded yet.</p>
+        {% endif %}
+    </div>
+
+    <div class="section">
+        <h2>📝 Recent Trading Log</h2>
+        {% if trading_log %}
+        <table>
+            <tr>
+                <th>Timestamp</th>
+                <th>Trade ID</th>
+                <th>Day</th>
+                <th>P&L</th>
+                <th>Decisions</th>
+            </tr>
+            {% for log in trading_log %}
+            <tr>
+                <td>{{ log.timestamp }}</td>
+                <td>{{ log.trade_id }}</td>
+                <td>{{ log.day }}</td>
+                <td>${{ "%.2f"|format(log.unrealized_pnl) if log.unrealized_pnl else "N/A" }}</td>
+                <td>{{ log.recommendations|length }} trades</td>
+            </tr>
+            {% endfor %}
+        </table>
+        {% else %}
+            <p>No trading activity recorded yet.</p>
+        {% endif %}
+    </div>
+</body>
+</html>
+"""
+_dashboard_template = app.jinja_env.from_string(DASHBOARD_HTML)
 
 
 @app.route('/dashboard', methods=['GET'])
@@ -208,128 +377,22 @@ def dashboard():
     """
     try:
         positions = load_positions()
-        trading_log = load_trading_log()
         
         # Fetch mothership positions
         mothership_positions = get_mothership_positions()
         
-        # Simple HTML dashboard
-        html = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Trading Dashboard</title>
-            <style>
-                body { font-family: Arial, sans-serif; margin: 20px; background-color: #f5f5f5; }
-                h1 { color: #333; }
-                h2 { color: #555; margin-top: 30px; }
-                table { border-collapse: collapse; width: 100%; margin-top: 20px; background-color: white; }
-                th, td { border: 1px solid #ddd; padding: 12px; text-align: left; }
-                th { background-color: #4CAF50; color: white; }
-                tr:nth-child(even) { background-color: #f9f9f9; }
-                .section { margin-top: 30px; background-color: white; padding: 20px; border-radius: 5px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }
-                .info { background-color: #e3f2fd; padding: 10px; border-radius: 5px; margin-bottom: 20px; }
-                .mothership-link { color: #1976d2; text-decoration: none; }
-                .mothership-link:hover { text-decoration: underline; }
-            </style>
-        </head>
-        <body>
-            <h1>🤖 Trading Dashboard</h1>
-            
-            <div class="info">
-                <strong>Mothership Positions:</strong> 
-                <a href="{{ mothership_url }}" target="_blank" class="mothership-link">
-                    View Live Positions on Mothership →
-                </a>
-            </div>
-            
-            <div class="section">
-                <h2>📊 Mothership Current Positions</h2>
-                {% if mothership_positions.error %}
-                    <p style="color: red;">Error fetching mothership positions: {{ mothership_positions.error }}</p>
-                {% elif mothership_positions %}
-                    <table>
-                        <tr>
-                            <th>Ticker</th>
-                            <th>Quantity</th>
-                            <th>Purchase Price</th>
-                        </tr>
-                        {% for pos in mothership_positions %}
-                        <tr>
-                            <td><strong>{{ pos.ticker }}</strong></td>
-                            <td>{{ pos.quantity }}</td>
-                            <td>${{ "%.2f"|format(pos.purchase_price) }}</td>
-                        </tr>
-                        {% endfor %}
-                    </table>
-                {% else %}
-                    <p>No positions found on mothership.</p>
-                {% endif %}
-            </div>
-            
-            <div class="section">
-                <h2>💼 Local Positions</h2>
-                {% if positions %}
-                <table>
-                    <tr>
-                        <th>Ticker</th>
-                        <th>Quantity</th>
-                        <th>Purchase Price</th>
-                    </tr>
-                    {% for pos in positions %}
-                    <tr>
-                        <td><strong>{{ pos.ticker }}</strong></td>
-                        <td>{{ pos.quantity }}</td>
-                        <td>${{ "%.2f"|format(pos.purchase_price) }}</td>
-                    </tr>
-                    {% endfor %}
-                </table>
-                {% else %}
-                    <p>No local positions recorded yet.</p>
-                {% endif %}
-            </div>
-            
-            <div class="section">
-                <h2>📝 Recent Trading Log</h2>
-                {% if trading_log %}
-                <table>
-                    <tr>
-                        <th>Timestamp</th>
-                        <th>Trade ID</th>
-                        <th>Day</th>
-                        <th>P&L</th>
-                        <th>Decisions</th>
-                    </tr>
-                    {% for log in trading_log[-10:] %}
-                    <tr>
-                        <td>{{ log.timestamp }}</td>
-                        <td>{{ log.trade_id }}</td>
-                        <td>{{ log.day }}</td>
-                        <td>${{ "%.2f"|format(log.unrealized_pnl) if log.unrealized_pnl else "N/A" }}</td>
-                        <td>{{ log.recommendations|length }} trades</td>
-                    </tr>
-                    {% endfor %}
-                </table>
-                {% else %}
-                    <p>No trading activity recorded yet.</p>
-                {% endif %}
-            </div>
-        </body>
-        </html>
-        """
-        
         mothership_url = os.getenv("MOTHERSHIP_POSITIONS_URL", "https://mothership-crg7hzedd6ckfegv.eastus-01.azurewebsites.net/positions")
         
-        return render_template_string(
-            html, 
+        return render_template(
+            _dashboard_template, 
             positions=positions, 
-            trading_log=trading_log,
+            trading_log=recent_trading_log(10),
             mothership_positions=mothership_positions if not isinstance(mothership_positions, dict) or 'error' not in mothership_positions else [],
             mothership_url=mothership_url
         ), 200
     
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return _json({"error": str(e)}, 500)
 
 
 if __name__ == '__main__':
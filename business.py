@@ -1,11 +1,22 @@
+import atexit
 import json
 import os
-from datetime import datetime
+import threading
+from datetime import date
+
+import json_utils
+from validators import coerce_numbers
 
 # File paths for data storage
 DATA_DIR = "data"
 POSITIONS_FILE = os.path.join(DATA_DIR, "current_positions.json")
-HISTORY_FILE = os.path.join(DATA_DIR, "trading_history.json")
+HISTORY_FILE = os.path.join(DATA_DIR, "trading_history.jsonl")
+
+# Create the data directory once rather than on every save
+os.makedirs(DATA_DIR, exist_ok=True)
+
+# Number of logged transactions between flushes of the history file
+FLUSH_EVERY = 10
 
 def analyze_tick(payload: dict) -> dict:
     """
@@ -18,12 +29,15 @@ def analyze_tick(payload: dict) -> dict:
     Returns:
         Dictionary with result, summary, and decisions
     """
+    # Numeric strings are converted once here so the loop below can use
+    # prices and quantities as-is
+    coerce_numbers(payload)
     positions = payload.get("Positions", [])
     market_summary = payload.get("Market_Summary", [])
     
     # Create a lookup dictionary for current prices
     current_prices = {
-        item["ticker"]: float(item["current_price"]) 
+        item["ticker"]: item["current_price"] 
         for item in market_summary
     }
     
@@ -32,17 +46,14 @@ def analyze_tick(payload: dict) -> dict:
     positions_evaluated = 0
     
     for position in positions:
-        ticker = position["ticker"]
-        quantity = float(position["quantity"])
-        purchase_price = float(position["purchase_price"])
+        # Skip positions we have no current price for
+        current_price = current_prices.get(position["ticker"])
+        if current_price is None:
+            continue
         
-        # Check if we have current price for this ticker
-        if ticker in current_prices:
-            current_price = current_prices[ticker]
-            # P&L = (current_price - purchase_price) * quantity
-            pnl = (current_price - purchase_price) * quantity
-            unrealized_pnl += pnl
-            positions_evaluated += 1
+        # P&L = (current_price - purchase_price) * quantity
+        unrealized_pnl += (current_price - position["purchase_price"]) * position["quantity"]
+        positions_evaluated += 1
     
     # Return structured response
     return {
@@ -62,22 +73,60 @@ def load_json_file(filepath):
         return []  # Return empty array if file doesn't exist
     
     try:
-        with open(filepath, 'r') as f:
-            return json.load(f)
+        return json_utils.load_file(filepath)
     except json.JSONDecodeError:
         return []  # Return empty array if file is corrupted
 
 def save_json_file(filepath, data):
-    """Save data to JSON file"""
-    # Create directory if it doesn't exist
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    """Save data to JSON file, replacing it atomically in a single write"""
+    json_utils.write_file(filepath, data)
+
+def load_current_positions():
+    """
+    Load current positions keyed by ticker: {"AAPL": {...}, "MSFT": {...}}.
+    Files in the old list format ([{...}, {...}]) are converted on load and
+    saved in the new format on the next update.
+    """
+    positions = load_json_file(POSITIONS_FILE)
+    if isinstance(positions, list):
+        positions = {position['ticker']: position for position in positions}
+    return positions
+
+# In-memory copy of the positions file, loaded once on import so updates
+# don't re-read it. Positions are keyed by ticker so updates don't scan the
+# whole list, and writes back to disk are coalesced to at most one per second.
+_cache_lock = threading.Lock()
+_positions_cache = load_current_positions()
+_positions_writer = json_utils.WriteCoalescer(POSITIONS_FILE)
+
+# Trading history is append-only, so each transaction is written as one
+# JSON line to a file handle kept open for the life of the process and
+# flushed every FLUSH_EVERY transactions (and at exit). Opening it repairs a
+# line torn by a crash, so new transactions don't get appended onto it.
+_history_file = json_utils.open_append(HISTORY_FILE)
+_pending_transactions = 0
+
+def flush():
+    """Write cached positions and buffered trading history to disk"""
+    global _pending_transactions
+    _positions_writer.flush()
+    with _cache_lock:
+        _history_file.flush()
+        _pending_transactions = 0
+
+atexit.register(flush)
+
+def load_trading_history():
+    """Load all transactions from the newline-delimited trading history file"""
+    # Make sure buffered transactions are on disk before reading
+    with _cache_lock:
+        _history_file.flush()
     
-    with open(filepath, 'w') as f:
-        json.dump(data, f, indent=2)
+    return json_utils.load_lines(HISTORY_FILE)
 
 def update_current_positions(tick_data):
     """
-    Update the current positions file with new market data.
+    Update the cached current positions with new market data.
     This is a full replace operation - updates existing positions or adds new ones.
     
     Args:
@@ -86,19 +135,15 @@ def update_current_positions(tick_data):
     Returns:
         Previous price for the ticker (or None if first time seeing it)
     """
-    positions = load_json_file(POSITIONS_FILE)
-    
     ticker = tick_data.get('ticker')
     new_price = tick_data.get('price')
     quantity = tick_data.get('quantity')
     purchase_price = tick_data.get('purchase_price')
     
-    # Find and update the position
-    old_price = None
-    position_found = False
-    
-    for position in positions:
-        if position['ticker'] == ticker:
+    with _cache_lock:
+        position = _positions_cache.get(ticker)
+        
+        if position is not None:
             old_price = position['current_price']
             position['current_price'] = new_price
             
@@ -107,23 +152,22 @@ def update_current_positions(tick_data):
                 (new_price - position['purchase_price']) * position['quantity'], 
                 2
             )
-            
-            position_found = True
-            break
-    
-    # If position doesn't exist, create it
-    if not position_found:
-        positions.append({
-            'ticker': ticker,
-            'quantity': quantity,
-            'purchase_price': purchase_price,
-            'current_price': new_price,
-            'unrealized_pnl': 0.0
-        })
-        old_price = new_price  # First time seeing this ticker
-    
-    # Save updated positions
-    save_json_file(POSITIONS_FILE, positions)
+        else:
+            # If position doesn't exist, create it
+            _positions_cache[ticker] = {
+                'ticker': ticker,
+                'quantity': quantity,
+                'purchase_price': purchase_price,
+                'current_price': new_price,
+                'unrealized_pnl': 0.0
+            }
+            old_price = new_price  # First time seeing this ticker
+        
+        # Submitted under the cache lock so concurrent updates reach the
+        # writer in the order they were applied and the newest one is saved
+        snapshot = {t: dict(p) for t, p in _positions_cache.items()}
+        _positions_writer.submit(snapshot)
+    
     return old_price
 
 def execute_trading_strategy(tick_data, previous_price):
@@ -133,7 +177,7 @@ def execute_trading_strategy(tick_data, previous_price):
     - If price goes DOWN or SAME: log a TICK_UPDATE (equivalent to STAY)
     
     Args:
-        tick_data: Dictionary with ticker, price, quantity
+        tick_data: Dictionary with ticker, price, quantity and optionally day
         previous_price: The previous price for comparison
         
     Returns:
@@ -142,6 +186,7 @@ def execute_trading_strategy(tick_data, previous_price):
     current_price = tick_data.get('price')
     ticker = tick_data.get('ticker')
     quantity = tick_data.get('quantity')
+    day = tick_data.get('day')
     
     if previous_price is None:
         # First tick for this ticker - don't log anything
@@ -154,7 +199,8 @@ def execute_trading_strategy(tick_data, previous_price):
             ticker=ticker,
             price=current_price,
             quantity=quantity,
-            note='Price increased - sell signal'
+            note='Price increased - sell signal',
+            day=day
         )
         return 'SELL'
     else:
@@ -164,13 +210,14 @@ def execute_trading_strategy(tick_data, previous_price):
             ticker=ticker,
             price=current_price,
             quantity=None,  # TICK_UPDATE doesn't need quantity
-            note='Price decreased - stay'
+            note='Price decreased - stay',
+            day=day
         )
         return 'STAY'
 
-def log_transaction(action, ticker, price, note, quantity=None):
+def log_transaction(action, ticker, price, note, quantity=None, day=None):
     """
-    Log a transaction to the trading history file.
+    Append a transaction to the trading history file.
     
     Args:
         action: 'BUY', 'SELL', or 'TICK_UPDATE'
@@ -178,11 +225,12 @@ def log_transaction(action, ticker, price, note, quantity=None):
         price: Transaction price
         note: Description of the transaction
         quantity: Number of shares (optional, not used for TICK_UPDATE)
+        day: Transaction date as 'YYYY-MM-DD' (optional, defaults to today)
     """
-    history = load_json_file(HISTORY_FILE)
+    global _pending_transactions
     
     transaction = {
-        'date': datetime.now().strftime('%Y-%m-%d'),
+        'date': day or date.today().isoformat(),
         'ticker': ticker,
         'action': action,
         'price': round(price, 2),
@@ -193,5 +241,10 @@ def log_transaction(action, ticker, price, note, quantity=None):
     if quantity is not None:
         transaction['quantity'] = quantity
     
-    history.append(transaction)
-    save_json_file(HISTORY_FILE, history)
\ No newline at end of file
+    line = json_utils.dumps(transaction) + b'\n'
+    with _cache_lock:
+        _history_file.write(line)
+        _pending_transactions += 1
+        if _pending_transactions >= FLUSH_EVERY:
+            _history_file.flush()
+            _pending_transactions = 0
\ No newline at end of file
@@ -1,6 +1,9 @@
+import logging
 import os
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -10,5 +13,4 @@ API_KEY = os.getenv("API_KEY", "").strip()
 if not API_KEY:
     raise ValueError("API_KEY not found in environment variables. Please set it in .env file")
 
-# Debug: print the API key when server starts (remove after testing)
-print(f"Loaded API_KEY: '{API_KEY}'")
\ No newline at end of file
+logger.debug("Loaded API_KEY: '%s'", API_KEY)
\ No newline at end of file
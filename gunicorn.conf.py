@@ -0,0 +1,12 @@
+# gunicorn.conf.py
+# Loaded automatically when gunicorn starts from this directory, which is how
+# Azure App Service runs the app (gunicorn app:app).
+
+# A single worker process: the trading log and pending positions writes live
+# in process memory, so every request must be handled by the same process.
+workers = 1
+
+# Threads let concurrent ticks overlap their OpenAI and mothership round trips
+# instead of queueing behind each other.
+worker_class = "gthread"
+threads = 8
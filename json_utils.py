@@ -0,0 +1,164 @@
+import atexit
+import json
+import logging
+import mmap
+import os
+import threading
+import time
+
+# orjson is much faster than the standard library on the numeric-heavy
+# payloads we read and write every tick; fall back to json if it is missing.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+def loads(data):
+    """Parse JSON from bytes or str"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(data, indent=False):
+    """Serialize data to UTF-8 JSON bytes, optionally with a 2-space indent"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else None)
+    if indent:
+        return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def load_file(filepath):
+    """
+    Parse a JSON file through a read-only memory map.
+    
+    The parser reads straight from the page cache instead of from a bytes
+    copy of the whole file. An empty file raises JSONDecodeError, the same
+    as reading it normally.
+    """
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return loads(b'')
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if orjson is None:
+                return json.loads(mm[:])
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+
+
+def load_lines(filepath):
+    """
+    Parse a newline-delimited JSON file into a list, one item per non-blank line.
+    
+    Lines that can't be parsed, such as a last line torn by a crash
+    mid-write, are logged and skipped rather than failing the whole load.
+    """
+    items = []
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return items
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for number, line in enumerate(iter(mm.readline, b''), 1):
+                if not line.strip():
+                    continue
+                try:
+                    items.append(loads(line))
+                except json.JSONDecodeError:
+                    logger.warning("Skipping unreadable line %d of %s", number, filepath)
+    return items
+
+
+def open_append(filepath):
+    """
+    Open a newline-delimited JSON file for appending, positioned so the next
+    write starts on a line of its own.
+    
+    A torn last line left by a crash mid-write is cut off (and logged); a
+    complete last line that only lacks its newline gets one.
+    """
+    f = open(filepath, 'a+b')
+    if f.seek(0, os.SEEK_END) == 0:
+        return f
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = mm.rfind(b'\n') + 1
+        tail = mm[start:]
+    if tail.strip():
+        try:
+            loads(tail)
+        except json.JSONDecodeError:
+            logger.warning("Removing a partial last line from %s", filepath)
+            f.truncate(start)
+        else:
+            f.write(b'\n')
+            f.flush()
+    return f
+
+
+def write_file(filepath, data):
+    """Atomically replace filepath with data serialized as indented JSON"""
+    tmp_path = filepath + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(dumps(data, indent=True))
+    os.replace(tmp_path, filepath)
+
+
+class WriteCoalescer:
+    """
+    Coalesce frequent saves of one JSON file into at most one write per interval.
+    
+    The first save after a quiet period is written immediately. Saves that
+    arrive within `interval` seconds of the last write only replace the
+    pending data, and a timer writes the latest version once the interval
+    has passed. Pending data is also written at interpreter exit.
+    """
+    
+    def __init__(self, filepath, interval=1.0):
+        self.filepath = filepath
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pending = None
+        self._last_flush = float('-inf')
+        self._timer = None
+        atexit.register(self.flush)
+    
+    def submit(self, data):
+        """Queue data to be written, flushing now if the interval has passed"""
+        with self._lock:
+            self._pending = data
+            if self._timer is not None:
+                return  # The scheduled flush will pick up this data
+            
+            delay = self.interval - (time.monotonic() - self._last_flush)
+            if delay <= 0:
+                self._flush_locked()
+            else:
+                self._timer = threading.Timer(delay, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+    
+    def flush(self):
+        """Write any pending data now"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._flush_locked()
+    
+    def _flush_from_timer(self):
+        # An exception in the timer thread would otherwise be lost silently;
+        # the data stays pending, so the next save or flush tries again
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Failed to write %s", self.filepath)
+    
+    def _flush_locked(self):
+        if self._pending is None:
+            return
+        write_file(self.filepath, self._pending)
+        self._pending = None
+        self._last_flush = time.monotonic()
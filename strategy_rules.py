@@ -1,26 +1,59 @@
 # strategy_rules.py
-from typing import List, Dict, Any
-from statistics import mean
+import math
+from collections import deque
+from operator import itemgetter, le
+from typing import Deque, List, Dict, Any
+
+_day_of = itemgetter("day")
+
+# Last few prices per ticker for decide_from_history_incremental; only the
+# long SMA window is ever needed, so older prices are dropped automatically
+_LONG_WINDOW = 5
+_recent_prices: Dict[str, Deque[float]] = {}
 
 def _sma(values: List[float], window: int) -> float:
     if window <= 0 or len(values) < window:
         return float("nan")
-    return mean(values[-window:])
+    # sum() is a C-level reduction; statistics.mean does exact rational
+    # arithmetic, which is many times slower for floats
+    return sum(values[-window:]) / window
 
-def decide_from_history(ticker: str, history_rows: List[Dict[str, Any]]) -> str:
-    """
-    Given all history rows for one ticker: [{"ticker":"AAPL","price":..., "day":...}, ...]
-    Return one of: "BUY", "SELL", "HOLD"
-    """
-    prices = [float(r["price"]) for r in sorted(history_rows, key=lambda r: r["day"])]
+def _decide_from_prices(prices: List[float]) -> str:
     if len(prices) < 3:  # not enough history, be conservative
         return "HOLD"
     short = _sma(prices, 3)
-    long = _sma(prices, 5) if len(prices) >= 5 else _sma(prices, len(prices))
+    long = _sma(prices, _LONG_WINDOW) if len(prices) >= _LONG_WINDOW else _sma(prices, len(prices))
     if short != short or long != long:  # NaN check
         return "HOLD"
+    if math.isclose(short, long):  # equal up to float rounding, e.g. flat prices
+        return "HOLD"
     if short > long:
         return "BUY"
     if short < long:
         return "SELL"
     return "HOLD"
+
+def decide_from_history(ticker: str, history_rows: List[Dict[str, Any]]) -> str:
+    """
+    Given all history rows for one ticker: [{"ticker":"AAPL","price":..., "day":...}, ...]
+    Return one of: "BUY", "SELL", "HOLD"
+    """
+    # History normally arrives in chronological order; only sort when it doesn't
+    days = list(map(_day_of, history_rows))
+    if not all(map(le, days, days[1:])):
+        history_rows = sorted(history_rows, key=_day_of)
+    prices = [float(r["price"]) for r in history_rows]
+    return _decide_from_prices(prices)
+
+def decide_from_history_incremental(ticker: str, new_price: float) -> str:
+    """
+    Record the next price for one ticker and decide from every price seen so far.
+    When prices are recorded in day order, gives the same answer as
+    decide_from_history over the full history (which sorts rows by day), but
+    only keeps the last 5 prices, so each call is O(1) instead of O(history).
+    Return one of: "BUY", "SELL", "HOLD"
+    """
+    # setdefault is atomic, so concurrent first calls for a ticker share one deque
+    prices = _recent_prices.setdefault(ticker, deque(maxlen=_LONG_WINDOW))
+    prices.append(float(new_price))
+    return _decide_from_prices(list(prices))
@@ -1,117 +1,394 @@
-# validators.py (snippet)
-from datetime import datetime
+# validators.py
+import hashlib
+import math
+import re
+import threading
+from collections import OrderedDict
+from datetime import date
+from operator import itemgetter
 
-def _is_iso_date(s: str) -> bool:
-    try:
-        datetime.strptime(s, "%Y-%m-%d")
+# Zero-padded YYYY-MM-DD with month 01-12 and day 01-31
+_ISO_DATE_RE = re.compile(r"(?!0000)[0-9]{4}-(?:0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])")
+
+# Numeric strings such as "12", "-3.5", ".5" or "1e-3" (no nan/inf)
+_NUM_RE = re.compile(r"[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?")
+
+def _is_number(x) -> bool:
+    # Parsed JSON numbers are checked by type without calling float() or
+    # raising; bool is deliberately not a number. NaN and +/-Infinity (which
+    # the stdlib JSON parser accepts) are rejected.
+    t = type(x)
+    if t is int:
+        return True
+    if t is float:
+        return math.isfinite(x)
+    if not isinstance(x, str):
+        return False
+    # Plain decimals such as "12" or "3.50" are checked by C-level string
+    # methods; isascii() rules out non-ASCII digits like "²", and 308 digits
+    # can't overflow a float
+    digits = x.replace(".", "", 1)
+    if digits.isascii() and digits.isdigit() and len(digits) <= 308:
         return True
-    except Exception:
+    # Signs and exponents go through the regex; "1e999" still overflows to inf
+    return _NUM_RE.fullmatch(x) is not None and math.isfinite(float(x))
+
+def parse_iso_date(s):
+    """
+    Parse a 'YYYY-MM-DD' string into a date.
+    Returns None if s is not a string in exactly that format, or not a real date.
+    """
+    if not isinstance(s, str) or _ISO_DATE_RE.fullmatch(s) is None:
+        return None
+    # fromisoformat is implemented in C and much faster than strptime; the
+    # regex keeps it to the strict format, since on Python 3.11+ it also
+    # accepts forms like "20240315" and "2024-W10-5"
+    try:
+        return date.fromisoformat(s)
+    except ValueError:
+        return None
+
+def _is_iso_date(s: str) -> bool:
+    if not isinstance(s, str):
+        return False
+    m = _ISO_DATE_RE.fullmatch(s)
+    if m is None:
         return False
+    if int(m.group(1)) <= 28:
+        return True  # Every month has at least 28 days
+    # Days 29-31 depend on the month and leap years
+    return parse_iso_date(s) is not None
+
+# Required fields, built once instead of on every call / row. The frozensets
+# let a whole row be checked with one `required.issubset(row)` call.
+_POSITION_FIELDS = ("ticker", "quantity", "purchase_price")
+_SUMMARY_FIELDS = ("ticker", "current_price")
+_HISTORY_FIELDS = ("ticker", "price", "day")
+_POSITION_REQUIRED = frozenset(_POSITION_FIELDS)
+_SUMMARY_REQUIRED = frozenset(_SUMMARY_FIELDS)
+_HISTORY_REQUIRED = frozenset(_HISTORY_FIELDS)
+
+# Stands in for absent keys, so a null value still counts as present
+_MISSING = object()
+
+_OBJECT_TYPES = {dict}
+_STR_TYPES = {str}
+_NUMBER_TYPES = {int, float}
+
+def _is_object(x) -> bool:
+    return isinstance(x, dict)
+
+def _is_str(x) -> bool:
+    return isinstance(x, str)
+
+def _is_nonempty_str(x) -> bool:
+    return isinstance(x, str) and bool(x.strip())
+
+def _first_invalid(values: list, check) -> int:
+    """Return the index of the first value failing check, or -1 if all pass"""
+    for i, value in enumerate(values):
+        if not check(value):
+            return i
+    return -1
+
+# Column validators: each takes one column and returns the index of its first
+# invalid value, or -1. The common all-valid case is decided by C-level
+# scans (type sets, sum, set); the per-value check only runs after that
+# fails, to find the index.
+
+def _first_non_object(values: list) -> int:
+    if _OBJECT_TYPES.issuperset(map(type, values)):
+        return -1
+    return _first_invalid(values, _is_object)
+
+def _first_non_str(values: list) -> int:
+    if _STR_TYPES.issuperset(map(type, values)):
+        return -1
+    return _first_invalid(values, _is_str)
+
+def _first_blank_str(values: list) -> int:
+    if _STR_TYPES.issuperset(map(type, values)) and all(map(str.strip, values)):
+        return -1
+    return _first_invalid(values, _is_nonempty_str)
+
+def _first_non_number(values: list) -> int:
+    # A NaN or infinity anywhere makes the sum non-finite
+    if _NUMBER_TYPES.issuperset(map(type, values)):
+        try:
+            if math.isfinite(sum(values)):
+                return -1
+        except OverflowError:
+            pass  # An int too large for a float; find it below
+    return _first_invalid(values, _is_number)
+
+def _first_non_date(values: list) -> int:
+    # Many rows share a day, so each distinct string is only parsed once
+    if _STR_TYPES.issuperset(map(type, values)) and all(map(_is_iso_date, set(values))):
+        return -1
+    return _first_invalid(values, _is_iso_date)
+
+# Per-column checks for each list, in the order a row is checked once all
+# its fields are present: (fields, column validator, error). Errors are
+# formatted with the row index.
+_POSITION_CHECKS = (
+    (("ticker",), _first_non_str, "Position at index {i}: ticker must be a string"),
+    (("quantity", "purchase_price"), _first_non_number, "Position at index {i}: quantity and purchase_price must be numeric"),
+)
+_SUMMARY_CHECKS = (
+    (("ticker",), _first_non_str, "Market Summary at index {i}: ticker must be a string"),
+    (("current_price",), _first_non_number, "Market Summary at index {i}: current_price must be numeric"),
+)
+_HISTORY_CHECKS = (
+    (("ticker",), _first_blank_str, "market_history at index {i}: ticker must be a non-empty string"),
+    (("price",), _first_non_number, "market_history at index {i}: price must be numeric"),
+    (("day",), _first_non_date, "market_history at index {i}: day must be a 'YYYY-MM-DD' string"),
+)
+
+# Whole-row checks for short lists, where transposing into columns costs
+# more than it saves. True only if the row passes every check above.
+
+def _position_ok(row) -> bool:
+    return (
+        type(row) is dict
+        and type(row.get("ticker")) is str
+        and _is_number(row.get("quantity", _MISSING))
+        and _is_number(row.get("purchase_price", _MISSING))
+    )
+
+def _summary_ok(row) -> bool:
+    return (
+        type(row) is dict
+        and type(row.get("ticker")) is str
+        and _is_number(row.get("current_price", _MISSING))
+    )
+
+def _history_ok(row) -> bool:
+    if type(row) is not dict:
+        return False
+    ticker = row.get("ticker")
+    return (
+        type(ticker) is str
+        and bool(ticker.strip())
+        and _is_number(row.get("price", _MISSING))
+        and _is_iso_date(row.get("day"))
+    )
+
+# Lists up to this length are checked row by row before falling back to columns
+_ROW_CHECK_MAX = 32
+
+# Every top-level list in the payload, in the order it is validated. The
+# keys are all required. Error messages are constants; row errors are only
+# formatted, with the row index and missing field, once a row has failed.
+_SCHEMA = {
+    "Positions": {
+        "not_list_error": "Positions must be a list",
+        "empty_error": "Positions must be a non-empty list",
+        "fields": _POSITION_FIELDS,
+        "required": _POSITION_REQUIRED,
+        "not_object_error": "Position at index {i} must be an object",
+        "missing_error": "Position at index {i} missing field: {field}",
+        "row_ok": _position_ok,
+        "checks": _POSITION_CHECKS,
+    },
+    "Market_Summary": {
+        "not_list_error": "Market Summary must be a list",
+        "empty_error": "Market Summary must be a non-empty list",
+        "fields": _SUMMARY_FIELDS,
+        "required": _SUMMARY_REQUIRED,
+        "not_object_error": "Market Summary item at index {i} must be an object",
+        "missing_error": "Market Summary item at index {i} missing required fields",
+        "row_ok": _summary_ok,
+        "checks": _SUMMARY_CHECKS,
+    },
+    "market_history": {
+        "not_list_error": "market_history must be a list",
+        "empty_error": None,  # market_history can be empty
+        "fields": _HISTORY_FIELDS,
+        "required": _HISTORY_REQUIRED,
+        "not_object_error": "market_history item at index {i} must be an object",
+        "missing_error": "market_history item at index {i} missing field: {field}",
+        "row_ok": _history_ok,
+        "checks": _HISTORY_CHECKS,
+    },
+}
+_REQUIRED_KEYS = tuple(_SCHEMA)
+
+def _columnize(rows: list, fields: tuple) -> dict:
+    """
+    Transpose a list of row objects into {field: [value of each row]}.
+    Raises TypeError if a row isn't an object, or KeyError if it lacks a field.
+    """
+    return {field: list(map(itemgetter(field), rows)) for field in fields}
+
+def _first_incomplete(rows: list, required: frozenset) -> int:
+    """Return the index of the first row missing a required field, or -1"""
+    return _first_invalid(rows, required.issubset)
 
-# ... inside validate_tick_payload for market_history:
-    if "market_history" not in payload or not isinstance(payload["market_history"], list):
-        return False, "Invalid payload: 'market_history' must be a list"
-    for i, h in enumerate(payload["market_history"]):
-        if not isinstance(h, dict):
-            return False, f"Invalid payload: market_history[{i}] must be an object"
-        if "ticker" not in h or not isinstance(h["ticker"], str) or not h["ticker"].strip():
-            return False, f"Invalid payload: market_history[{i}].ticker must be a non-empty string"
-        if "price" not in h or not _is_number(h["price"]):
-            return False, f"Invalid payload: market_history[{i}].price must be a number"
-        # NEW: expect a string date, not an int
-        if "day" not in h or not isinstance(h["day"], str) or not _is_iso_date(h["day"]):
-            return False, f"Invalid payload: market_history[{i}].day must be 'YYYY-MM-DD' string"
-
-
-def validate_tick_payload(payload: dict) -> tuple:
+
+def _validate_rows(rows: list, rules: dict) -> tuple:
+    """
+    Validate a list of row objects one column at a time.
+    
+    Rows are transposed into columns and each check scans one column. The
+    error returned is the one a row-by-row loop would hit first: the lowest
+    failing row index, and for that row the earliest check in `checks`.
+    
+    Returns:
+        Tuple of (is_valid: bool, error_message: str)
+    """
+    # The common case, rows that are all complete objects, transposes in one
+    # pass per field with no separate row scans: itemgetter raises TypeError
+    # for a row that isn't an object and KeyError for one missing a field.
+    # Only then are the rows scanned to find the first bad one, and once a
+    # row fails, only the rows before it still need to be checked.
+    fields = rules["fields"]
+    end = len(rows)
+    error = None
+    missing_field = None
+    try:
+        columns = _columnize(rows, fields)
+    except (TypeError, KeyError):
+        i = _first_non_object(rows)
+        if i != -1:
+            end = i
+            error = rules["not_object_error"]
+            rows = rows[:i]
+        i = _first_incomplete(rows, rules["required"])
+        if i != -1:
+            end = i
+            error = rules["missing_error"]
+            missing_field = next(field for field in fields if field not in rows[i])
+            rows = rows[:i]
+        columns = _columnize(rows, fields)
+    
+    for check_fields, first_invalid, message in rules["checks"]:
+        for field in check_fields:
+            values = columns[field]
+            if end < len(values):
+                values = values[:end]
+            i = first_invalid(values)
+            if i != -1:
+                end = i
+                error = message
+    
+    if error is None:
+        return True, ""
+    return False, error.format(i=end, field=missing_field)
+
+
+# Results for recently seen request bodies, so repeated or retried ticks skip
+# validation. Keyed on a digest of the raw bytes, which fully determine the
+# result, so large bodies aren't kept alive by the cache.
+_RESULT_CACHE_SIZE = 256
+_result_cache = OrderedDict()
+_result_cache_lock = threading.Lock()
+
+def clear_validation_cache():
+    """Forget all cached validation results"""
+    with _result_cache_lock:
+        _result_cache.clear()
+
+
+def validate_tick_payload(payload: dict, raw: bytes = None) -> tuple:
     """
     Validates the /tick endpoint payload.
     
+    Positions and Market_Summary must be non-empty lists; market_history is a
+    list that may be empty. Rows need ticker/quantity/purchase_price,
+    ticker/current_price and ticker/price/day respectively, with numeric
+    prices and quantities and days given as 'YYYY-MM-DD' strings.
+    
     Args:
         payload: The JSON payload from the request
+        raw: The request body payload was parsed from, if available. Results
+            are cached by body, so a repeated body is not validated again.
         
     Returns:
         Tuple of (is_valid: bool, error_message: str)
     """
+    if raw is None:
+        return _validate_payload(payload)
+    
+    key = hashlib.sha256(raw).digest()
+    with _result_cache_lock:
+        result = _result_cache.get(key)
+        if result is not None:
+            _result_cache.move_to_end(key)
+            return result
+    
+    result = _validate_payload(payload)
+    with _result_cache_lock:
+        _result_cache[key] = result
+        if len(_result_cache) > _RESULT_CACHE_SIZE:
+            _result_cache.popitem(last=False)
+    return result
+
+
+def _validate_payload(payload: dict) -> tuple:
     if not isinstance(payload, dict):
         return (False, "Payload must be a JSON object")
     
-    # Check required top-level keys
-    required_keys = ["Positions", "Market_Summary", "market_history"]
-    for key in required_keys:
-        if key not in payload:
+    # Check required top-level keys, looking each one up only once
+    sections = [payload.get(key, _MISSING) for key in _REQUIRED_KEYS]
+    for key, section in zip(_REQUIRED_KEYS, sections):
+        if section is _MISSING:
             return (False, f"Missing required field: {key}")
     
-    # Validate Positions
-    positions = payload["Positions"]
-    if not isinstance(positions, list):
-        return False, "Positions must be a list"
-    if len(positions) == 0:
-        return False, "Positions must be a non-empty list"
-    
-    for i, pos in enumerate(positions):
-        if not isinstance(pos, dict):
-            return False, f"Position at index {i} must be an object"
-        
-        # Check required fields in each position
-        pos_fields = ["ticker", "quantity", "purchase_price"]
-        for field in pos_fields:
-            if field not in pos:
-                return False, f"Position at index {i} missing field: {field}"
-        
-        # Validate types
-        if not isinstance(pos["ticker"], str):
-            return False, f"Position at index {i}: ticker must be a string"
-        try:
-            float(pos["quantity"])
-            float(pos["purchase_price"])
-        except (ValueError, TypeError):
-            return False, f"Position at index {i}: quantity and purchase_price must be numeric"
-    
-    # Validate Market_Summary
-    market_summary = payload["Market_Summary"]
-    if not isinstance(market_summary, list):
-        return False, "Market Summary must be a list"
-    if len(market_summary) == 0:
-        return False, "Market Summary must be a non-empty list"
-    
-    for i, item in enumerate(market_summary):
-        if not isinstance(item, dict):
-            return False, f"Market Summary item at index {i} must be an object"
+    for section, rules in zip(sections, _SCHEMA.values()):
+        if not isinstance(section, list):
+            return False, rules["not_list_error"]
+        if len(section) == 0 and rules["empty_error"] is not None:
+            return False, rules["empty_error"]
         
-        # Check required fields
-        if "ticker" not in item or "current_price" not in item:
-            return False, f"Market Summary item at index {i} missing required fields"
+        # Short lists that are valid (the common case) pass in one C-level all()
+        # over whole-row checks; failures are located column by column below
+        if len(section) <= _ROW_CHECK_MAX and all(map(rules["row_ok"], section)):
+            continue
         
-        if not isinstance(item["ticker"], str):
-            return False, f"Market Summary at index {i}: ticker must be a string"
-        try:
-            float(item["current_price"])
-        except (ValueError, TypeError):
-            return False, f"Market Summary at index {i}: current_price must be numeric"
+        is_valid, error = _validate_rows(section, rules)
+        if not is_valid:
+            return False, error
     
-    # Validate market_history
-    market_history = payload["market_history"]
-    if not isinstance(market_history, list):
-        return False, "market_history must be a list"
-    # market_history can be empty, so we don't check length
+    return True, ""
+
+
+# Fields of each list that hold numbers; validate_tick_payload also accepts
+# them as numeric strings
+_NUMBER_FIELDS = {
+    "Positions": ("quantity", "purchase_price"),
+    "Market_Summary": ("current_price",),
+    "market_history": ("price",),
+}
+
+def _to_number(s: str):
+    # Plain digit strings become ints, as the JSON parser would return them
+    if s.isascii() and s.isdigit() and len(s) <= 308:
+        return int(s)
+    return float(s)
+
+def coerce_numbers(payload: dict) -> dict:
+    """
+    Convert numeric strings in the payload's number fields to numbers, in place.
     
-    for i, item in enumerate(market_history):
-        if not isinstance(item, dict):
-            return False, f"market_history item at index {i} must be an object"
-        
-        # Check required fields
-        hist_fields = ["ticker", "price", "day"]
-        for field in hist_fields:
-            if field not in item:
-                return False, f"market_history item at index {i} missing field: {field}"
-        
-        if not isinstance(item["ticker"], str):
-            return False, f"market_history at index {i}: ticker must be a string"
-        try:
-            float(item["price"])
-            int(item["day"])
-        except (ValueError, TypeError):
-            return False, f"market_history at index {i}: price must be numeric and day must be an integer"
+    Run once when a payload comes in, so later code can do arithmetic on the
+    values directly. Fields that already hold numbers, the common case, are
+    left as they are.
     
-    return True, ""
+    Returns:
+        The same payload
+    """
+    for key, fields in _NUMBER_FIELDS.items():
+        rows = payload.get(key)
+        if not isinstance(rows, list):
+            continue
+        for field in fields:
+            try:
+                # One C-level pass settles the common case of no strings at all
+                if str not in set(map(type, map(itemgetter(field), rows))):
+                    continue
+            except (TypeError, KeyError):
+                pass  # Some row isn't a complete object; check row by row
+            for row in rows:
+                if isinstance(row, dict) and isinstance(row.get(field), str):
+                    row[field] = _to_number(row[field])
+    return payload